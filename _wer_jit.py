@@ -0,0 +1,88 @@
+"""numba kernels for `wer`.
+
+Kept in their own module so that importing `wer` doesn't pull in numba; `wer`
+imports this lazily, the first time an input is large enough to benefit.
+"""
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def ed_kernel(ref_ids, hyp_ids):
+    """Same recurrence and backtrack as `wer._edit_distance_py`, over int32 ids."""
+    n = ref_ids.shape[0]
+    m = hyp_ids.shape[0]
+
+    dp = np.empty((n + 1, m + 1), np.int32)
+    for i in range(n + 1):
+        dp[i, 0] = i
+    for j in range(m + 1):
+        dp[0, j] = j
+
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            if ref_ids[i - 1] == hyp_ids[j - 1]:
+                dp[i, j] = dp[i - 1, j - 1]
+            else:
+                best = dp[i - 1, j - 1]
+                if dp[i, j - 1] < best:
+                    best = dp[i, j - 1]
+                if dp[i - 1, j] < best:
+                    best = dp[i - 1, j]
+                dp[i, j] = best + 1
+
+    i, j = n, m
+    S = D = I = 0
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and ref_ids[i - 1] == hyp_ids[j - 1]:
+            i -= 1
+            j -= 1
+        elif i > 0 and j > 0 and dp[i, j] == dp[i - 1, j - 1] + 1:
+            S += 1
+            i -= 1
+            j -= 1
+        elif j > 0 and dp[i, j] == dp[i, j - 1] + 1:
+            I += 1
+            j -= 1
+        else:
+            D += 1
+            i -= 1
+
+    return S, D, I
+
+
+@njit(cache=True)
+def row_kernel(ref_ids, hyp_ids):
+    """Same as `wer._ed_two_row_py`, over int32 ids."""
+    n = ref_ids.shape[0]
+    m = hyp_ids.shape[0]
+    prev = np.arange(m + 1).astype(np.int32)
+    cur = np.empty(m + 1, np.int32)
+    for i in range(1, n + 1):
+        cur[0] = i
+        r = ref_ids[i - 1]
+        for j in range(1, m + 1):
+            if r == hyp_ids[j - 1]:
+                cur[j] = prev[j - 1]
+            else:
+                best = prev[j - 1]
+                if prev[j] < best:
+                    best = prev[j]
+                if cur[j - 1] < best:
+                    best = cur[j - 1]
+                cur[j] = best + 1
+        prev, cur = cur, prev
+    return prev
+
+
+@njit(parallel=True, cache=True)
+def wer_batch_kernel(ref_flat, ref_off, hyp_flat, hyp_off, out):
+    """Fill out[k] with the WER of pair k; pairs are slices of the flat id buffers."""
+    for k in prange(out.shape[0]):
+        ref = ref_flat[ref_off[k]:ref_off[k + 1]]
+        hyp = hyp_flat[hyp_off[k]:hyp_off[k + 1]]
+        n = ref.shape[0]
+        if n == 0:
+            out[k] = 0.0 if hyp.shape[0] == 0 else np.inf
+        else:
+            out[k] = row_kernel(ref, hyp)[-1] / n
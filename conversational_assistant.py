@@ -5,23 +5,40 @@ Usage:
   python conversational_assistant.py --model ./model --ollama-model tinyllama:1.1b
 
 Requirements: `vosk`, `sounddevice`, `pyttsx3` (or `espeak`), `requests`.
+Optional: `webrtcvad` to skip silence before it reaches the recognizer, `orjson`
+for faster JSON parsing.
 
 This script listens for a spoken utterance, sends the transcription as a prompt
 to a local Ollama model (HTTP API at localhost:11434 or `ollama` CLI fallback),
 speaks the assistant reply and keeps short history to make the conversation coherent.
+
+The reply is streamed: each sentence is queued for TTS as soon as the model
+finishes it, so speech starts while the rest of the reply is still generating.
 """
 import argparse
-import json
-import queue
+import asyncio
+import collections
+import itertools
+import re
 import subprocess
 import sys
+import threading
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List
 
 import requests
+from requests.adapters import HTTPAdapter
+
+# orjson is a faster drop-in for the JSON parsed on every turn (streamed
+# NDJSON fragments, VOSK results); fall back to the stdlib parser
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
 
 try:
-    from vosk import Model, KaldiRecognizer
+    from vosk import Model, KaldiRecognizer, BatchModel, BatchRecognizer, GpuInit
 except Exception as e:
     print("Missing dependency 'vosk'. Install with: pip install vosk", file=sys.stderr)
     raise
@@ -32,52 +49,118 @@ except Exception as e:
     print("Missing dependency 'sounddevice' or PortAudio system library.", file=sys.stderr)
     raise
 
+# Optional voice activity detection: skip feeding silence to the recognizer
+try:
+    import webrtcvad
+    _have_webrtcvad = True
+except Exception:
+    _have_webrtcvad = False
+
+# cffi ships with both vosk and sounddevice; used to hand ring buffers to the
+# recognizer without copying (KaldiRecognizer only accepts bytes or cdata)
+from cffi import FFI
+
+_ffi = FFI()
+
 # reuse tts from project helper if available
 try:
-    from tts_stt import tts_say, verify_model
+    from tts_stt import tts_say, verify_model, get_vosk_model
 except Exception:
     # fallback: simple print if import fails
-    def tts_say(text: str):
+    def tts_say(text: str, wait: bool = True):
         print("TTS:", text)
 
     def verify_model(path: str):
         return
 
+    def get_vosk_model(path: str) -> Model:
+        return Model(path)
+
 
 API_URL = "http://localhost:11434/api/generate"
 
+# Patterns used by clean_reply, compiled once at import
+_ROLE_PREFIX_RE = re.compile(r'^(?:AI|Assistant|User|System|Answer):\s*', flags=re.MULTILINE)
+_ROLE_INLINE_RE = re.compile(r'\b(?:User|Assistant|AI|System|Answer):\s*')
+_MULTI_NL_RE = re.compile(r'\n{2,}')
+_MULTI_WS_RE = re.compile(r'[ \t]{2,}')
 
-def query_ollama_http(prompt: str, model: str) -> str:
+# Fast-path matchers for the fields read from each streamed NDJSON line
+_RESP_RE = re.compile(rb'"response"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_DONE_RE = re.compile(rb'"done"\s*:\s*true')
+
+# One session for the whole conversation so every turn reuses the same
+# keep-alive connection to the local Ollama server.
+_SESSION = requests.Session()
+_SESSION.headers.update({'Connection': 'keep-alive'})
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+_SESSION.mount('http://', _adapter)
+_SESSION.mount('https://', _adapter)
+
+
+def stream_ollama_http(prompt: str, model: str) -> Iterator[str]:
+    """Yield reply fragments from the Ollama HTTP API as they arrive."""
     payload = {"model": model, "prompt": prompt}
-    # Ollama local API often streams NDJSON fragments. Request streaming and
-    # aggregate the 'response' fields into a single string.
-    try:
-        resp = requests.post(API_URL, json=payload, stream=True, timeout=60)
+    # Ollama local API streams NDJSON fragments; yield each 'response' field
+    with _SESSION.post(API_URL, json=payload, stream=True, timeout=60) as resp:
         resp.raise_for_status()
-        pieces = []
-        # iterate over lines (NDJSON or JSON fragments)
-        for raw in resp.iter_lines(decode_unicode=True):
+        # a JSON fragment split across lines (starts with a brace but doesn't
+        # end with one yet) is buffered until it completes, instead of paying
+        # for a failed parse on each piece
+        pending = []
+        # iterate over raw byte lines (NDJSON or JSON fragments)
+        for raw in resp.iter_lines(chunk_size=4096):
             if not raw:
                 continue
+            is_json_start = raw.lstrip().startswith((b'{', b'['))
+            if not raw.rstrip().endswith((b'}', b']')):
+                if pending or is_json_start:
+                    pending.append(raw)
+                else:
+                    # not JSON at all; keep it as raw text
+                    yield raw.decode('utf-8', 'replace')
+                continue
+            if pending:
+                pending.append(raw)
+                raw = b''.join(pending)
+                pending = []
+                is_json_start = True
+            # Fast path: pull the one string field we need out of the line
+            # without building the whole object (the final envelope carries
+            # a large 'context' array)
+            m = _RESP_RE.search(raw) if is_json_start else None
+            if m is not None:
+                part = m.group(1)
+                # only escaped strings need a real JSON decode
+                yield _loads(b'"' + part + b'"') if b'\\' in part else part.decode('utf-8')
+                if _DONE_RE.search(raw):
+                    break
+                continue
             # Sometimes the server may send non-JSON control lines; skip those
             try:
-                obj = json.loads(raw)
+                obj = _loads(raw)
             except Exception:
                 # if it's not JSON, try to append raw text
-                pieces.append(raw)
+                yield raw.decode('utf-8', 'replace')
+                continue
+            if not isinstance(obj, dict):
                 continue
             # Ollama streaming fragments commonly include a 'response' field
-            if isinstance(obj, dict) and 'response' in obj:
+            if 'response' in obj:
                 part = obj.get('response') or ''
-                pieces.append(str(part))
+                yield str(part)
             # If a final envelope with done=true is provided, break
-            if isinstance(obj, dict) and obj.get('done'):
+            if obj.get('done'):
                 break
-        # Join and return the concatenated response
-        return ''.join(pieces).strip()
-    except Exception:
-        # Let caller fallback to CLI if HTTP streaming fails
-        raise
+        # anything left over never completed into JSON; keep it as raw text
+        if pending:
+            yield b''.join(pending).decode('utf-8', 'replace')
+
+
+def query_ollama_http(prompt: str, model: str) -> str:
+    # Join the streamed fragments; errors propagate so the caller can fall
+    # back to the CLI
+    return ''.join(stream_ollama_http(prompt, model)).strip()
 
 
 def query_ollama_cli(prompt: str, model: str) -> str:
@@ -110,135 +193,501 @@ def clean_reply(text: str) -> str:
     """
     if not text:
         return text
-    # If the response looks like a JSON object (starts with { and contains "response"),
-    # try to extract the 'response' field repeatedly until we get a string.
-    try:
-        # Sometimes the model returns a full JSON object string; try parsing.
-        obj = json.loads(text)
-        if isinstance(obj, dict):
-            # prefer a 'response' or 'output' key
-            for k in ("response", "output", "text", "result"):
-                if k in obj and isinstance(obj[k], str):
-                    text = obj[k]
-                    break
-    except Exception:
-        # not JSON — continue
-        pass
+    # If the response looks like a JSON object (starts with { and ends with }),
+    # try to extract the 'response' field. Plain-text replies, the common
+    # case, fail this check without attempting a parse.
+    stripped = text.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        try:
+            # Sometimes the model returns a full JSON object string; try parsing.
+            obj = _loads(stripped)
+            if isinstance(obj, dict):
+                # prefer a 'response' or 'output' key
+                for k in ("response", "output", "text", "result"):
+                    if k in obj and isinstance(obj[k], str):
+                        text = obj[k]
+                        break
+        except Exception:
+            # not JSON — continue
+            pass
 
     # Remove common role prefixes at line starts: 'AI:', 'Assistant:', 'User:', 'System:', 'Answer:'
-    import re
-    text = re.sub(r'^(?:AI|Assistant|User|System|Answer):\s*', '', text, flags=re.MULTILINE)
+    text = _ROLE_PREFIX_RE.sub('', text)
     # Remove any stray repeated labels like 'User: ... Assistant:' within the text
-    text = re.sub(r'\b(?:User|Assistant|AI|System|Answer):\s*', '', text)
+    text = _ROLE_INLINE_RE.sub('', text)
     # Collapse multiple whitespace/newlines
-    text = re.sub(r'\n{2,}', '\n', text)
-    text = re.sub(r'[ \t]{2,}', ' ', text)
+    text = _MULTI_NL_RE.sub('\n', text)
+    text = _MULTI_WS_RE.sub(' ', text)
     return text.strip()
 
 
-def listen_once(model: Model, device: int | None, sample_rate: int = 16000, timeout: float | None = None) -> str:
-    """Listen from the default microphone until a final VOSK result is produced.
+def load_gpu_model(path: str) -> BatchModel | None:
+    """Load `path` as a vosk BatchModel for CUDA decoding.
+
+    Returns None when the installed vosk wheel was built without CUDA (most
+    pip wheels are); BatchModel creation fails in that case.
+    """
+    verify_model(path)
+    GpuInit()
+    try:
+        return BatchModel(path)
+    except Exception:
+        return None
+
+
+# webrtcvad classifies 20 ms frames; once an utterance has started, this much
+# continuous silence flushes it even if VOSK hasn't produced a final result
+_VAD_FRAME_MS = 20
+_VAD_TRAILING_SILENCE = 2.0
+# int16 peak above which a frame counts as speech when webrtcvad isn't used
+_ENERGY_VAD_THRESHOLD = 500
+
+
+def make_vad(level: int, sample_rate: int):
+    """Return a webrtcvad.Vad at `level` (0-3), or None if VAD can't be used."""
+    if not _have_webrtcvad:
+        return None
+    frame = sample_rate * _VAD_FRAME_MS // 1000
+    if not webrtcvad.valid_rate_and_frame_length(sample_rate, frame):
+        print(f"VAD doesn't support {sample_rate} Hz; feeding all audio to VOSK.", file=sys.stderr)
+        return None
+    return webrtcvad.Vad(level)
+
 
-    Returns the recognized text (possibly empty string).
+class _EnergyVad:
+    """Peak-amplitude stand-in for webrtcvad.Vad, used to end GPU utterances.
+
+    A BatchRecognizer emits nothing until its stream is finished, so without
+    some endpoint a GPU listen would record forever.
     """
+
+    def __init__(self, threshold: int = _ENERGY_VAD_THRESHOLD):
+        self.threshold = threshold
+
+    def is_speech(self, frame, sample_rate: int) -> bool:
+        samples = memoryview(frame).cast('h')
+        return max(samples) > self.threshold or -min(samples) > self.threshold
+
+
+def _has_speech(vad, data, sample_rate: int) -> bool:
+    # check each 20 ms sub-frame of a block (int16 mono -> 2 bytes per sample)
+    step = sample_rate * _VAD_FRAME_MS // 1000 * 2
+    return any(vad.is_speech(data[i:i + step], sample_rate)
+               for i in range(0, len(data) - step + 1, step))
+
+
+def make_recognizer(model: Model, sample_rate: int = 16000) -> KaldiRecognizer:
     rec = KaldiRecognizer(model, sample_rate)
     rec.SetWords(True)
-    q: queue.Queue[bytes] = queue.Queue()
+    return rec
+
+
+def listen_once(model: Model | BatchModel, device: int | None, sample_rate: int = 16000, timeout: float | None = None,
+                stop: threading.Event | None = None, vad=None, rec: KaldiRecognizer | None = None) -> str:
+    """Listen from the default microphone until a final VOSK result is produced.
+
+    Returns the recognized text (possibly empty string). Setting `stop` makes
+    it return "" early; this is how the async loop cancels a listen running
+    in a worker thread. A BatchModel (see `load_gpu_model`) decodes on the GPU
+    through a BatchRecognizer instead of a KaldiRecognizer.
+
+    With a `vad` (see `make_vad`), blocks are only fed to the recognizer once
+    speech has been detected, and an utterance followed by a long silence is
+    flushed with FinalResult() (FinishStream() on the GPU, which also flushes
+    on timeout). The GPU only produces results once its stream is finished,
+    so without a `vad` it falls back to a simple energy check.
+
+    Pass `rec` (see `make_recognizer`) to reuse one KaldiRecognizer across
+    calls; it is Reset() before returning. Otherwise one is created per call.
+    """
+    if isinstance(model, BatchModel):
+        rec = BatchRecognizer(model, sample_rate)
+        if vad is None:
+            vad = _EnergyVad()
+
+        def feed(data) -> str | None:
+            # the GPU decodes asynchronously: wait for this block to be
+            # processed, then poll for a finished utterance
+            rec.AcceptWaveform(_ffi.from_buffer(data))
+            model.Wait()
+            res = rec.Result()
+            return _loads(res).get('text', '') if res else None
+
+        finished = False
+
+        def flush() -> str | None:
+            # FinishStream() makes the GPU emit the pending utterance; the
+            # stream is closed afterwards, so this may only happen once
+            nonlocal finished
+            rec.FinishStream()
+            finished = True
+            model.Wait()
+            res = rec.Result()
+            return _loads(res).get('text', '') if res else ""
+
+        def finish():
+            if not finished:
+                rec.FinishStream()
+
+        # nothing is decoded until the stream is finished, so whatever was
+        # heard before the timeout is still returned
+        on_timeout = flush
+    else:
+        if rec is None:
+            rec = make_recognizer(model, sample_rate)
+
+        def feed(data) -> str | None:
+            if rec.AcceptWaveform(_ffi.from_buffer(data)):
+                return _loads(rec.Result()).get('text', '')
+            # partial = json.loads(rec.PartialResult())
+            return None
+
+        def flush() -> str | None:
+            return _loads(rec.FinalResult()).get('text', '')
+
+        def finish():
+            # drop any half-heard utterance so the next listen starts clean
+            rec.Reset()
+
+        def on_timeout() -> str:
+            return ""
+
+    # The PortAudio callback only copies into a preallocated ring slot, appends
+    # a view of it and sets the event; deque.append is atomic, so the real-time
+    # thread never blocks on a queue lock or allocates. A slot is reused 12
+    # blocks after it was written and a queued block is at most 8 blocks old,
+    # so a popped block (or the VAD pre-roll) stays valid for at least 4 more
+    # blocks, 2 s at 0.5 s per block.
+    ring = [bytearray(8000 * 2) for _ in range(12)]
+    slots = itertools.cycle(ring)
+    dq: collections.deque = collections.deque(maxlen=8)
+    have_data = threading.Event()
 
     def callback(indata, frames, time_info, status):
         if status:
             print(status, file=sys.stderr)
-        q.put(bytes(indata))
+        buf = next(slots)
+        n = len(indata)
+        buf[:n] = indata
+        dq.append(memoryview(buf)[:n])
+        have_data.set()
 
     try:
         with sd.RawInputStream(samplerate=sample_rate, blocksize=8000, dtype='int16', channels=1,
                                callback=callback, device=device):
             start = time.time()
+            last_speech = None
+            preroll = None
             print("Listening (speak now)...")
             while True:
-                try:
-                    data = q.get(timeout=0.5)
-                except queue.Empty:
-                    if timeout and (time.time() - start) > timeout:
+                if not dq:
+                    have_data.wait(0.5)
+                    have_data.clear()
+                    if stop is not None and stop.is_set():
                         return ""
+                    if not dq and timeout and (time.time() - start) > timeout:
+                        return on_timeout()
                     continue
-                if rec.AcceptWaveform(data):
-                    res = json.loads(rec.Result())
-                    return res.get('text', '')
-                else:
-                    # partial = json.loads(rec.PartialResult())
-                    pass
+                data = dq.popleft()
+                if vad is not None:
+                    if _has_speech(vad, data, sample_rate):
+                        last_speech = time.time()
+                        if preroll is not None:
+                            # the block before onset usually holds the start
+                            # of the first word
+                            feed(preroll)
+                            preroll = None
+                    elif last_speech is None:
+                        # still waiting for speech; keep one block of context
+                        preroll = data
+                        continue
+                    elif time.time() - last_speech > _VAD_TRAILING_SILENCE:
+                        text = flush()
+                        if text is not None:
+                            return text
+                text = feed(data)
+                if text is not None:
+                    return text
     except KeyboardInterrupt:
         return ""
     except sd.PortAudioError as e:
         print("PortAudio error while opening the input stream:", e, file=sys.stderr)
         raise
+    finally:
+        finish()
 
 
-def build_prompt(history: List[dict], user_text: str) -> str:
-    # Simple role-annotated conversation history to provide context
-    out = []
-    # prepend a short system instruction to bias the assistant to be concise
-    out.append("System: You are a concise, helpful conversational assistant. Keep replies short and user-friendly.")
-    for m in history[-10:]:
-        role = m.get('role', 'user')
-        text = m.get('text', '')
-        out.append(f"{role.capitalize()}: {text}")
-    out.append(f"User: {user_text}")
-    out.append("Assistant:")
-    return "\n".join(out)
+_SYSTEM_PROMPT = "System: You are a concise, helpful conversational assistant. Keep replies short and user-friendly."
 
+# Prompt labels for the roles stored in history, so build_prompt doesn't
+# capitalize and format each one per turn
+_ROLE_STR = {'user': 'User: ', 'assistant': 'Assistant: ', 'system': 'System: '}
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--model', default='./model', help='Path to VOSK model directory')
-    parser.add_argument('--device', type=int, default=None, help='sounddevice device id')
-    parser.add_argument('--rate', type=int, default=16000, help='sample rate')
-    parser.add_argument('--ollama-model', default='tinyllama:1.1b', help='Ollama model name')
-    parser.add_argument('--timeout', type=float, default=None, help='Listen timeout in seconds (per utterance)')
-    parser.add_argument('--no-clean', action='store_true', help="Don't post-process/clean the model reply")
-    args = parser.parse_args()
 
-    try:
-        verify_model(args.model)
-    except Exception as e:
-        print("VOSK model verification failed:", e, file=sys.stderr)
-        return
+def _role_str(role: str) -> str:
+    return _ROLE_STR.get(role) or f"{role.capitalize()}: "
 
-    # Load VOSK model once
-    vosk_model = Model(args.model)
 
-    history: List[dict] = []
+class ConversationHistory:
+    """Sliding window of past turns that formats each turn's prompt line once.
+
+    Iterating yields the turns as {'role', 'text'} dicts. The joined prompt
+    prefix (system line plus all turns) is cached and extended on append; it
+    is only rebuilt when the window is full and the oldest turn is evicted.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._turns: collections.deque = collections.deque(maxlen=maxlen)
+        self._lines: collections.deque = collections.deque(maxlen=maxlen)
+        self._prefix: str | None = _SYSTEM_PROMPT
+
+    def append(self, role: str, text: str):
+        line = _role_str(role) + text
+        if len(self._turns) == self.maxlen:
+            # the oldest line drops out of the prefix; rebuild it lazily
+            self._prefix = None
+        elif self._prefix is not None:
+            self._prefix += "\n" + line
+        self._turns.append({'role': role, 'text': text})
+        self._lines.append(line)
+
+    def prompt_prefix(self) -> str:
+        if self._prefix is None:
+            self._prefix = "\n".join([_SYSTEM_PROMPT, *self._lines])
+        return self._prefix
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def __len__(self):
+        return len(self._turns)
+
+
+def build_prompt(history: Iterable[dict], user_text: str) -> str:
+    # Simple role-annotated conversation history to provide context; the
+    # caller bounds `history`, so use all of it. A short system instruction
+    # first biases the assistant to be concise.
+    if isinstance(history, ConversationHistory):
+        prefix = history.prompt_prefix()
+    else:
+        prefix = "\n".join([_SYSTEM_PROMPT] + [_role_str(m.get('role', 'user')) + m.get('text', '') for m in history])
+    return prefix + "\nUser: " + user_text + "\nAssistant:"
+
+
+# Partial replies are flushed to TTS at these boundaries
+_SENTENCE_END = ('.', '?', '!')
+_CLAUSE_MIN_WORDS = 4
+_MAX_CHUNK_TOKENS = 80
+# Streamed fragments are sub-word tokens, so chunks are only cut at the last
+# whitespace; the text after it may be an unfinished word
+_LAST_SPACE_RE = re.compile(r'\s(?=\S*\Z)')
+
+
+def is_sentence_boundary(buf: str, n_tokens: int) -> bool:
+    """Return True when `buf` is worth sending to TTS on its own.
+
+    Flushes on sentence-ending punctuation, on a comma once the chunk has at
+    least four words, or once the chunk has collected 80 streamed tokens.
+    Callers pass text that ends at a word boundary.
+    """
+    tail = buf.rstrip()
+    if not tail:
+        return False
+    if tail.endswith(_SENTENCE_END):
+        return True
+    if tail.endswith(',') and len(tail.split()) >= _CLAUSE_MIN_WORDS:
+        return True
+    return n_tokens >= _MAX_CHUNK_TOKENS
+
+
+async def _speak_worker(tts_q: asyncio.Queue, executor: ThreadPoolExecutor):
+    # Single consumer, so chunks are spoken in the order they were queued
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await tts_q.get()
+        try:
+            # only the last queued chunk waits for playback to end, so
+            # tts_q.join() returns once the reply has actually been spoken
+            await loop.run_in_executor(executor, tts_say, chunk, tts_q.empty())
+        except Exception as e:
+            print("TTS failed:", e, file=sys.stderr)
+        finally:
+            tts_q.task_done()
+
+
+async def stream_reply(prompt: str, model: str, tts_q: asyncio.Queue, clean: bool = True,
+                       cancel: threading.Event | None = None) -> str:
+    """Stream a reply from Ollama, queueing each sentence for TTS as it completes.
+
+    The blocking HTTP stream runs in a worker thread and hands fragments to the
+    event loop. Falls back to the `ollama` CLI (speaking the whole reply at
+    once) if the HTTP API fails before producing anything. Returns the full
+    reply text.
+
+    Setting `cancel` (or cancelling this coroutine) makes the worker stop at
+    the next fragment and close the HTTP response, so shutdown doesn't wait
+    for the model to finish generating.
+    """
+    loop = asyncio.get_running_loop()
+    token_q: asyncio.Queue = asyncio.Queue()
+    done = object()
+    if cancel is None:
+        cancel = threading.Event()
+
+    def post(item):
+        try:
+            loop.call_soon_threadsafe(token_q.put_nowait, item)
+        except RuntimeError:
+            # the loop is already closed (Ctrl+C); nobody is waiting
+            pass
+
+    def produce():
+        fragments = stream_ollama_http(prompt, model)
+        try:
+            for piece in fragments:
+                if cancel.is_set():
+                    break
+                post(piece)
+        except Exception as e:
+            post(e)
+        finally:
+            # closing the generator closes the HTTP response
+            fragments.close()
+            post(done)
+
+    def tidy(text: str) -> str:
+        if clean:
+            try:
+                return clean_reply(text)
+            except Exception:
+                # if cleaning fails, keep raw text
+                pass
+        return text.strip()
+
+    def speak(chunk: str):
+        chunk = tidy(chunk)
+        if chunk:
+            tts_q.put_nowait(chunk)
+
+    producer = loop.run_in_executor(None, produce)
+    error = None
+    pieces: List[str] = []
+    buf = ''
+    n_tokens = 0
+    try:
+        while True:
+            item = await token_q.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                error = item
+                continue
+            pieces.append(item)
+            buf += item
+            n_tokens += 1
+            m = _LAST_SPACE_RE.search(buf)
+            if m is not None and is_sentence_boundary(buf[:m.start()], n_tokens):
+                speak(buf[:m.start()])
+                buf = buf[m.start():]
+                n_tokens = 0
+    except BaseException:
+        cancel.set()
+        raise
+    await producer
+    if error is not None:
+        # whatever arrived before the failure is still spoken and kept
+        print("LLM stream failed:", error, file=sys.stderr)
+    speak(buf)
+
+    # the reply kept in history is the whole stream cleaned once, not the
+    # spoken chunks glued back together
+    full = ''.join(pieces).strip()
+    if not full and error is not None:
+        full = await loop.run_in_executor(None, query_ollama_cli, prompt, model)
+        speak(full)
+    reply = tidy(full)
+    if not reply:
+        reply = "Sorry, I couldn't produce a response."
+        speak(reply)
+    return reply
+
+
+async def run(args, vosk_model: Model):
+    loop = asyncio.get_running_loop()
+    # pyttsx3 engines aren't thread-safe; keep all speech on one thread
+    tts_executor = ThreadPoolExecutor(max_workers=1)
+    tts_q: asyncio.Queue = asyncio.Queue()
+    speaker = asyncio.create_task(_speak_worker(tts_q, tts_executor))
+    # set on shutdown; stops both the listen and the LLM worker threads
+    stopping = threading.Event()
+    vad = make_vad(args.vad, args.rate) if args.vad is not None else None
+    # one recognizer for the whole session, reset between utterances; batch
+    # (GPU) streams are finished per utterance, so listen_once makes those
+    rec = None if isinstance(vosk_model, BatchModel) else make_recognizer(vosk_model, args.rate)
+
+    # sliding window: old turns fall off the left as new ones are appended
+    history = ConversationHistory(args.history_window)
     print("Conversational assistant started. Press Ctrl+C to exit.")
     try:
         while True:
-            user_text = listen_once(vosk_model, args.device, sample_rate=args.rate, timeout=args.timeout)
+            user_text = await loop.run_in_executor(
+                None, listen_once, vosk_model, args.device, args.rate, args.timeout, stopping, vad, rec)
             if not user_text:
                 # no speech detected
                 continue
             print("Heard:", user_text)
-            history.append({'role': 'user', 'text': user_text})
+            history.append('user', user_text)
 
             prompt = build_prompt(history, user_text)
             print("Querying LLM...")
-            reply = query_ollama(prompt, args.ollama_model)
-            if not reply:
-                reply = "Sorry, I couldn't produce a response."
-            if not args.no_clean:
-                try:
-                    reply = clean_reply(reply)
-                except Exception:
-                    # if cleaning fails, keep raw reply
-                    pass
+            reply = await stream_reply(prompt, args.ollama_model, tts_q, clean=not args.no_clean,
+                                       cancel=stopping)
             print("Assistant:", reply)
-            history.append({'role': 'assistant', 'text': reply})
+            history.append('assistant', reply)
 
-            # Speak the reply
-            try:
-                tts_say(reply)
-            except Exception as e:
-                print("TTS failed:", e, file=sys.stderr)
+            # don't listen again until the reply has been spoken, otherwise
+            # the microphone picks up the assistant's own voice
+            await tts_q.join()
+    finally:
+        stopping.set()
+        speaker.cancel()
+        tts_executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='./model', help='Path to VOSK model directory')
+    parser.add_argument('--device', type=int, default=None, help='sounddevice device id')
+    parser.add_argument('--rate', type=int, default=16000, help='sample rate')
+    parser.add_argument('--ollama-model', default='tinyllama:1.1b', help='Ollama model name')
+    parser.add_argument('--timeout', type=float, default=None, help='Listen timeout in seconds (per utterance)')
+    parser.add_argument('--no-clean', action='store_true', help="Don't post-process/clean the model reply")
+    parser.add_argument('--gpu', action='store_true',
+                        help='Decode with the CUDA batch recognizer (needs a vosk build with CUDA)')
+    parser.add_argument('--vad', type=int, choices=range(4), default=2,
+                        help='webrtcvad aggressiveness (0-3) used to skip silence, if webrtcvad is installed')
+    parser.add_argument('--no-vad', dest='vad', action='store_const', const=None,
+                        help='Feed all audio to VOSK, including silence')
+    parser.add_argument('--history-window', type=int, default=10,
+                        help='Number of past messages (user and assistant) kept as prompt context')
+    args = parser.parse_args()
+
+    # Load VOSK model once
+    try:
+        vosk_model = None
+        if args.gpu:
+            vosk_model = load_gpu_model(args.model)
+            if vosk_model is None:
+                print("This vosk build has no CUDA support; decoding on the CPU.", file=sys.stderr)
+        if vosk_model is None:
+            vosk_model = get_vosk_model(args.model)
+    except Exception as e:
+        print("VOSK model verification failed:", e, file=sys.stderr)
+        return
 
+    try:
+        asyncio.run(run(args, vosk_model))
     except KeyboardInterrupt:
         print('\nExiting')
 
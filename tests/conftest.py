@@ -0,0 +1,9 @@
+import sys
+import types
+
+try:
+    import sounddevice  # noqa: F401
+except Exception:
+    # PortAudio isn't available everywhere; the code under test never opens
+    # a real stream, so a stand-in module is enough
+    sys.modules['sounddevice'] = types.SimpleNamespace(PortAudioError=Exception)
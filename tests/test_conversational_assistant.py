@@ -0,0 +1,259 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("vosk")
+pytest.importorskip("requests")
+import conversational_assistant as ca
+
+
+class FakeResponse:
+    """Stands in for a streamed requests.Response over canned NDJSON lines."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size=512):
+        return iter(self.lines)
+
+
+def stream(monkeypatch, lines):
+    monkeypatch.setattr(ca._SESSION, 'post', lambda *a, **k: FakeResponse(lines))
+    return list(ca.stream_ollama_http('prompt', 'model'))
+
+
+def test_stream_keeps_non_json_lines_before_json(monkeypatch):
+    lines = [b'garbage text', b'{"response":"hi","done":true}']
+    assert stream(monkeypatch, lines) == ['garbage text', 'hi']
+
+
+def test_stream_joins_json_split_across_lines(monkeypatch):
+    lines = [b'{"response":"hel', b'lo","done":false}', b'{"response":"","done":true}']
+    assert stream(monkeypatch, lines) == ['hello', '']
+
+
+def test_stream_decodes_escapes_and_non_ascii(monkeypatch):
+    texts = ['say "hi"', 'back\\slash\n', 'café ☕', 'naïve', '']
+    for ensure_ascii in (True, False):
+        lines = [json.dumps({"model": "m", "response": t, "done": False}, ensure_ascii=ensure_ascii).encode('utf-8')
+                 for t in texts]
+        assert stream(monkeypatch, lines) == texts
+
+
+def test_stream_stops_at_done_envelope(monkeypatch):
+    done = {"model": "m", "response": "", "done": True, "context": list(range(2000)), "total_duration": 1}
+    lines = [b'{"response":"Hi","done":false}', b'', b'{"response":" there","done":false}',
+             json.dumps(done).encode(), b'{"response":"never read","done":false}']
+    assert stream(monkeypatch, lines) == ['Hi', ' there', '']
+
+
+def test_history_prompt_matches_list_window_across_evictions():
+    n = 4
+    history = ca.ConversationHistory(n)
+    turns = []
+    for i in range(15):
+        role = 'user' if i % 2 == 0 else 'assistant'
+        history.append(role, f'turn {i}')
+        turns.append({'role': role, 'text': f'turn {i}'})
+        if i % 3 == 0:
+            # exercise the cached prefix being extended after it was built
+            history.prompt_prefix()
+        assert list(history) == turns[-n:]
+        assert ca.build_prompt(history, 'next') == ca.build_prompt(turns[-n:], 'next')
+
+
+def run_stream_reply(monkeypatch, fragments):
+    monkeypatch.setattr(ca, 'stream_ollama_http', lambda prompt, model: (f for f in fragments))
+
+    async def go():
+        tts_q = asyncio.Queue()
+        reply = await ca.stream_reply('prompt', 'model', tts_q)
+        chunks = []
+        while not tts_q.empty():
+            chunks.append(tts_q.get_nowait())
+        return reply, chunks
+
+    return asyncio.run(go())
+
+
+def test_stream_reply_only_cuts_chunks_at_whitespace(monkeypatch):
+    # 90 sub-word fragments with no punctuation forces the token-count flush
+    fragments = [' ab' if i % 3 == 0 else 'ab' for i in range(90)] + ['cd', ' done.']
+    reply, chunks = run_stream_reply(monkeypatch, fragments)
+    full = ''.join(fragments).strip()
+    assert reply == full
+    assert len(chunks) > 1
+    assert ' '.join(chunks) == full
+    assert all(word == 'ababab' for word in chunks[0].split())
+
+
+def test_stream_reply_flushes_sentences_as_they_complete(monkeypatch):
+    fragments = ['Hello', ' there', '.', ' How', ' are', ' you', '?']
+    reply, chunks = run_stream_reply(monkeypatch, fragments)
+    assert chunks == ['Hello there.', 'How are you?']
+    assert reply == 'Hello there. How are you?'
+
+
+def test_stream_reply_logs_a_failed_stream_and_keeps_partial_text(monkeypatch, capsys):
+    def broken(prompt, model):
+        yield 'Hello there.'
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(ca, 'stream_ollama_http', broken)
+    tts_q = asyncio.Queue()
+    reply = asyncio.run(ca.stream_reply('prompt', 'model', tts_q))
+    assert reply == 'Hello there.'
+    assert "LLM stream failed: connection reset" in capsys.readouterr().err
+
+
+def test_speak_worker_waits_for_playback_on_the_last_queued_chunk(monkeypatch):
+    said = []
+    monkeypatch.setattr(ca, 'tts_say', lambda text, wait=True: said.append((text, wait)))
+
+    async def go():
+        tts_q = asyncio.Queue()
+        for chunk in ('one.', 'two.', 'three.'):
+            tts_q.put_nowait(chunk)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            worker = asyncio.create_task(ca._speak_worker(tts_q, executor))
+            await tts_q.join()
+            worker.cancel()
+
+    asyncio.run(go())
+    assert said == [('one.', False), ('two.', False), ('three.', True)]
+
+
+def test_cancelled_stream_reply_closes_the_stream(monkeypatch):
+    closed = threading.Event()
+
+    def endless(prompt, model):
+        try:
+            while True:
+                time.sleep(0.02)
+                yield 'word '
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(ca, 'stream_ollama_http', endless)
+
+    async def go():
+        task = asyncio.ensure_future(ca.stream_reply('prompt', 'model', asyncio.Queue()))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.time()
+    asyncio.run(go())
+    assert closed.is_set()
+    assert time.time() - start < 2
+
+
+class FakeBatchModel:
+    def Wait(self):
+        pass
+
+
+class FakeBatchRecognizer:
+    """Like vosk's BatchRecognizer: nothing comes out until FinishStream()."""
+
+    def __init__(self, model, rate):
+        self.fed = 0
+        self.finished = 0
+
+    def AcceptWaveform(self, data):
+        assert not self.finished
+        self.fed += len(data)
+
+    def FinishStream(self):
+        self.finished += 1
+
+    def Result(self):
+        return f'{{"text":"heard {self.fed} bytes"}}' if self.finished == 1 else ''
+
+
+class FakeVad:
+    def is_speech(self, frame, rate):
+        return any(frame)
+
+
+def fake_input_stream(blocks):
+    """An sd.RawInputStream stand-in that plays `blocks` through the callback."""
+
+    class Stream:
+        def __init__(self, callback, **kwargs):
+            self.callback = callback
+
+        def play(self):
+            for block in blocks:
+                time.sleep(0.02)
+                self.callback(block, len(block) // 2, None, None)
+
+        def __enter__(self):
+            threading.Thread(target=self.play, daemon=True).start()
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    return Stream
+
+
+def listen_on_gpu(monkeypatch, blocks, **kwargs):
+    recs = []
+
+    def make_rec(model, rate):
+        recs.append(FakeBatchRecognizer(model, rate))
+        return recs[-1]
+
+    monkeypatch.setattr(ca, 'BatchModel', FakeBatchModel)
+    monkeypatch.setattr(ca, 'BatchRecognizer', make_rec)
+    monkeypatch.setattr(ca.sd, 'RawInputStream', fake_input_stream(blocks), raising=False)
+    text = ca.listen_once(FakeBatchModel(), None, **kwargs)
+    return text, recs[0]
+
+
+SPEECH = (1000).to_bytes(2, 'little') * 8000
+SILENCE = bytes(16000)
+
+
+def test_gpu_listen_flushes_after_trailing_silence(monkeypatch):
+    monkeypatch.setattr(ca, '_VAD_TRAILING_SILENCE', 0.05)
+    text, rec = listen_on_gpu(monkeypatch, [SILENCE, SPEECH, SPEECH] + [SILENCE] * 10, vad=FakeVad())
+    # the pre-roll block plus both speech blocks, and whatever silence was
+    # fed before the flush
+    assert text.startswith('heard ') and rec.fed >= 3 * 16000
+    assert rec.finished == 1
+
+
+def test_gpu_listen_returns_what_was_heard_on_timeout(monkeypatch):
+    text, rec = listen_on_gpu(monkeypatch, [SPEECH, SPEECH], timeout=0.2)
+    assert text == 'heard 32000 bytes'
+    assert rec.finished == 1
+
+
+def test_gpu_listen_without_vad_ends_on_silence(monkeypatch):
+    monkeypatch.setattr(ca, '_VAD_TRAILING_SILENCE', 0.05)
+    result = []
+    listen = threading.Thread(target=lambda: result.append(
+        listen_on_gpu(monkeypatch, [SILENCE, SPEECH, SPEECH] + [SILENCE] * 10, vad=None)), daemon=True)
+    listen.start()
+    listen.join(5)
+    assert result, "listen_once never returned"
+    text, rec = result[0]
+    assert text.startswith('heard ') and rec.fed >= 3 * 16000
+    assert rec.finished == 1
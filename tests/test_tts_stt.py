@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("vosk")
+import tts_stt
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="fake espeak is a shell script")
+def test_espeak_fallback_speaks_each_line_while_running(tmp_path, monkeypatch):
+    # stand-in espeak that logs its arguments and each line as it reads it
+    log = tmp_path / 'spoken.txt'
+    fake = tmp_path / 'espeak'
+    fake.write_text('#!/bin/sh\n'
+                    f'echo "args:$*" >> "{log}"\n'
+                    f'while IFS= read -r line; do echo "said:$line" >> "{log}"; done\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(tts_stt, '_have_pyttsx3', False)
+    monkeypatch.setattr(tts_stt, '_ESPEAK_PROC', None)
+
+    tts_stt.tts_say("hello\nthere", wait=False)
+    proc = tts_stt._ESPEAK_PROC
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline and 'said:' not in (log.read_text() if log.exists() else ''):
+            time.sleep(0.02)
+        # spoken while the process is still running, not only at exit
+        assert proc.poll() is None
+        assert log.read_text().splitlines() == ['args:', 'said:hello there']
+    finally:
+        proc.stdin.close()
+        proc.wait()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="fake espeak is a shell script")
+def test_espeak_fallback_waits_for_playback_by_default(tmp_path, monkeypatch):
+    log = tmp_path / 'spoken.txt'
+    fake = tmp_path / 'espeak'
+    # "done" is only logged once espeak has read everything and is exiting
+    fake.write_text('#!/bin/sh\n'
+                    f'while IFS= read -r line; do sleep 0.1; echo "said:$line" >> "{log}"; done\n'
+                    f'echo done >> "{log}"\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(tts_stt, '_have_pyttsx3', False)
+    monkeypatch.setattr(tts_stt, '_ESPEAK_PROC', None)
+
+    tts_stt.tts_say("first", wait=False)
+    tts_stt.tts_say("second")
+    assert log.read_text().splitlines() == ['said:first', 'said:second', 'done']
+    assert tts_stt._ESPEAK_PROC is None
@@ -1,6 +1,12 @@
 import math
+import os
+import subprocess
+import sys
 
-from wer import wer
+import pytest
+
+import wer as wer_mod
+from wer import wer, wer_batch
 
 
 def test_perfect_match():
@@ -37,3 +43,39 @@ def test_empty_reference_and_hypothesis():
 def test_empty_reference_nonempty_hypothesis():
     val = wer("", "hello")
     assert val == float('inf')
+
+
+def test_numba_kernel_matches_python(monkeypatch):
+    if wer_mod._jit() is None:
+        pytest.skip("numba not installed")
+    # force the compiled path for a short input
+    monkeypatch.setattr(wer_mod, '_JIT_MIN_CELLS', 0)
+    ref = "the quick brown fox jumps over the lazy dog".split()
+    hyp = "a quick brown dog jumped over lazy the dog today".split()
+    ref_ids, hyp_ids = wer_mod._intern(ref, hyp)
+    assert wer_mod._edit_distance(ref_ids, hyp_ids) == wer_mod._edit_distance_py(ref, hyp)
+
+
+def test_short_inputs_do_not_load_numba():
+    # run in a fresh interpreter so other tests' imports don't leak in
+    code = ("import sys, wer; wer.wer('a b c', 'a c'); "
+            "assert 'numba' not in sys.modules and '_wer_jit' not in sys.modules")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+def test_hirschberg_matches_full_matrix():
+    ref = "the quick brown fox jumps over the lazy dog".split()
+    hyp = "a quick brown dog jumped over lazy the dog today".split()
+    S, D, I = wer_mod._edit_distance_py(ref, hyp)
+    ops = wer_mod._hirschberg(ref, hyp)
+    assert ops.count('S') + ops.count('D') + ops.count('I') == S + D + I
+    assert ops.count('D') - ops.count('I') == len(ref) - len(hyp)
+
+
+def test_wer_batch_matches_wer():
+    pytest.importorskip("numpy")
+    refs = ["hello world", "hello wonderful world", "", "", "the cat sat"]
+    hyps = ["hello there", "hello world", "", "hello", "the cat sat"]
+    scores = wer_batch(refs, hyps)
+    assert [float(s) for s in scores] == [wer(r, h) for r, h in zip(refs, hyps)]
@@ -9,10 +9,12 @@ Usage:
 The script uses sounddevice for audio capture and a streaming recognizer.
 """
 import argparse
+import atexit
 import sys
-import queue
+import collections
+import functools
+import itertools
 import threading
-import json
 import subprocess
 import os
 
@@ -34,6 +36,19 @@ except Exception as e:
     # re-raise so the exception trace is still visible to the user
     raise
 
+# cffi ships with both vosk and sounddevice; used to hand ring buffers to the
+# recognizer without copying (KaldiRecognizer only accepts bytes or cdata)
+from cffi import FFI
+
+_ffi = FFI()
+
+# orjson is a faster drop-in for parsing VOSK results; fall back to the
+# stdlib parser
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
 # TTS: try pyttsx3, fallback to espeak via subprocess
 try:
     import pyttsx3
@@ -41,7 +56,23 @@ try:
 except Exception:
     _have_pyttsx3 = False
 
-AUDIO_QUEUE = queue.Queue()
+# Captured audio blocks. PortAudio reuses its input buffer, so the callback
+# copies each block into the next slot of a preallocated ring instead of
+# allocating a new bytes object, then appends a memoryview of that slot and
+# sets AUDIO_READY. Readers pop from the left via next_audio_block().
+#
+# A slot is reused _RING_SIZE blocks after it was written. A queued block is
+# at most _QUEUE_BLOCKS old (older ones are evicted, dropping that audio if
+# the reader falls more than 4 s behind), so once popped the reader has at
+# least _RING_SIZE - _QUEUE_BLOCKS blocks (2 s at 0.5 s per block) to finish
+# with it before its slot is overwritten.
+_QUEUE_BLOCKS = 8
+_RING_SIZE = _QUEUE_BLOCKS + 4
+_BLOCK_BYTES = 8000 * 2  # blocksize=8000 frames of mono int16
+AUDIO_RING = [bytearray(_BLOCK_BYTES) for _ in range(_RING_SIZE)]
+_ring_slots = itertools.cycle(AUDIO_RING)
+AUDIO_BUFFER: collections.deque = collections.deque(maxlen=_QUEUE_BLOCKS)
+AUDIO_READY = threading.Event()
 
 
 def list_audio_devices():
@@ -60,22 +91,98 @@ def list_audio_devices():
 
 
 
-def tts_say(text: str):
-    """Speak text using pyttsx3 or espeak fallback."""
+# pyttsx3.init() loads the driver and enumerates voices, which is slow on a
+# Pi, so one engine is created on first use and reused. The engine isn't
+# thread-safe; _ENGINE_LOCK serializes access.
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def tts_say(text: str, wait: bool = True):
+    """Speak text using pyttsx3 or espeak fallback.
+
+    Returns once the text has been spoken. With `wait=False` the espeak
+    fallback may return while it is still talking, so the next utterance
+    follows without a gap; a later call with `wait=True` waits for both.
+    pyttsx3 always blocks.
+    """
+    global _ENGINE
     if _have_pyttsx3:
-        engine = pyttsx3.init()
-        engine.say(text)
-        engine.runAndWait()
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = pyttsx3.init()
+            _ENGINE.say(text)
+            _ENGINE.runAndWait()
     else:
         # fallback to espeak (must be installed on system)
-        subprocess.run(["espeak", text])
+        _espeak_say(text, wait)
+
+
+# Without pyttsx3, one espeak process is kept alive and fed a line per
+# utterance instead of forking espeak for every call. It runs in line mode (no
+# text argument and no --stdin): with --stdin espeak reads until EOF before
+# speaking anything. espeak has no per-line completion signal, so waiting for
+# playback means closing its stdin and waiting for it to exit; the next call
+# starts a fresh process.
+_ESPEAK_PROC = None
+_ESPEAK_LOCK = threading.Lock()
+
+
+def _espeak_say(text: str, wait: bool = True):
+    global _ESPEAK_PROC
+    line = text.replace('\n', ' ').encode('utf-8') + b'\n'
+    with _ESPEAK_LOCK:
+        for _ in range(2):
+            if _ESPEAK_PROC is None or _ESPEAK_PROC.poll() is not None:
+                _ESPEAK_PROC = subprocess.Popen(["espeak"], stdin=subprocess.PIPE)
+            try:
+                _ESPEAK_PROC.stdin.write(line)
+                _ESPEAK_PROC.stdin.flush()
+                break
+            except BrokenPipeError:
+                # espeak exited underneath us; start a fresh one and retry once
+                _ESPEAK_PROC = None
+        else:
+            raise RuntimeError("espeak process keeps exiting")
+        if wait:
+            # espeak exits after speaking everything it has been sent
+            proc, _ESPEAK_PROC = _ESPEAK_PROC, None
+            proc.stdin.close()
+            proc.wait()
+
+
+@atexit.register
+def _close_espeak():
+    if _ESPEAK_PROC is not None and _ESPEAK_PROC.poll() is None:
+        try:
+            _ESPEAK_PROC.stdin.close()
+        except BrokenPipeError:
+            pass
+        _ESPEAK_PROC.wait()
 
 
 def audio_callback(indata, frames, time, status):
     if status:
         print(status, file=sys.stderr)
-    # convert to bytes
-    AUDIO_QUEUE.put(bytes(indata))
+    buf = next(_ring_slots)
+    n = len(indata)
+    buf[:n] = indata
+    AUDIO_BUFFER.append(memoryview(buf)[:n])
+    AUDIO_READY.set()
+
+
+def next_audio_block(timeout: float):
+    """Return the next captured audio block, or None if none arrives within timeout.
+
+    The block is a memoryview into the ring; pass it through `_ffi.from_buffer`
+    before handing it to the recognizer.
+    """
+    if not AUDIO_BUFFER:
+        AUDIO_READY.wait(timeout)
+        AUDIO_READY.clear()
+        if not AUDIO_BUFFER:
+            return None
+    return AUDIO_BUFFER.popleft()
 
 
 def verify_model(path: str) -> None:
@@ -86,22 +193,35 @@ def verify_model(path: str) -> None:
     library which can fail with an opaque message.
     """
     abs_path = os.path.abspath(path)
-    if not os.path.exists(abs_path):
-        raise FileNotFoundError(f"Model path does not exist: {abs_path}")
+    # List each directory once and check names in memory rather than stat-ing
+    # every candidate path (stats are slow on SD cards and network mounts)
+    try:
+        with os.scandir(abs_path) as it:
+            top = {e.name for e in it}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Model path does not exist: {abs_path}") from None
+    except NotADirectoryError:
+        top = set()
+    graph = _list_dir(os.path.join(abs_path, 'graph')) if 'graph' in top else set()
 
     # Common files VOSK models contain (some variants differ). Check several
-    # possibilities to provide a useful hint to the user.
+    # possibilities to provide a useful hint to the user. Cheap checks come
+    # first so the am/ and ivector/ listings are usually skipped.
     candidates = [
         os.path.join(abs_path, 'am', 'final.mdl'),
         os.path.join(abs_path, 'final.mdl'),
         os.path.join(abs_path, 'graph', 'Gr.fst'),
         os.path.join(abs_path, 'ivector', 'final.ie'),
     ]
-
-    missing = [c for c in candidates if not os.path.exists(c)]
+    found = (
+        'final.mdl' in top
+        or 'Gr.fst' in graph
+        or ('am' in top and 'final.mdl' in _list_dir(os.path.join(abs_path, 'am')))
+        or ('ivector' in top and 'final.ie' in _list_dir(os.path.join(abs_path, 'ivector')))
+    )
     # If *all* candidates are missing, warn the user. If at least one exists,
     # most likely the model is present (different model layouts exist).
-    if len(missing) == len(candidates):
+    if not found:
         details = '\n'.join(f" - {c}" for c in candidates)
         raise FileNotFoundError(
             f"No expected model files were found under {abs_path}.\n"
@@ -111,8 +231,8 @@ def verify_model(path: str) -> None:
 
     # VOSK expects a words.txt in the graph directory; check explicitly to
     # provide a clearer hint when it's missing (this was the observed failure).
-    words_path = os.path.join(abs_path, 'graph', 'words.txt')
-    if not os.path.exists(words_path):
+    if 'words.txt' not in graph:
+        words_path = os.path.join(abs_path, 'graph', 'words.txt')
         raise FileNotFoundError(
             f"Missing required file: {words_path}\n"
             "This usually means the model archive wasn't fully extracted or the"
@@ -121,6 +241,25 @@ def verify_model(path: str) -> None:
         )
 
 
+def _list_dir(path: str) -> set:
+    """Return the entry names in `path`, or an empty set if it isn't a directory."""
+    try:
+        with os.scandir(path) as it:
+            return {e.name for e in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
+
+@functools.lru_cache(maxsize=4)
+def get_vosk_model(path: str) -> Model:
+    """Verify and load a VOSK model, reusing an already-loaded one for the same path.
+
+    Raises whatever `verify_model` or `Model` raise; failures aren't cached.
+    """
+    verify_model(path)
+    return Model(path)
+
+
 class STTWorker(threading.Thread):
     def __init__(self, model_path: str, sample_rate: int = 16000):
         super().__init__(daemon=True)
@@ -134,22 +273,20 @@ class STTWorker(threading.Thread):
     def run(self):
         # perform basic checks to give a clearer error if model files are missing
         try:
-            verify_model(self.model_path)
+            model = get_vosk_model(self.model_path)
         except Exception as e:
             print("Model verification failed:", e, file=sys.stderr)
             return
 
-        model = Model(self.model_path)
         rec = KaldiRecognizer(model, self.sample_rate)
         rec.SetWords(True)
         print("STT worker started")
         while not self._stop.is_set():
-            try:
-                data = AUDIO_QUEUE.get(timeout=0.1)
-            except queue.Empty:
+            data = next_audio_block(0.1)
+            if data is None:
                 continue
-            if rec.AcceptWaveform(data):
-                res = json.loads(rec.Result())
+            if rec.AcceptWaveform(_ffi.from_buffer(data)):
+                res = _loads(rec.Result())
                 text = res.get("text", "")
                 if text:
                     print("RECOGNIZED:", text)
@@ -189,12 +326,11 @@ def run_demo(model_path: str, device: int | None, sample_rate: int = 16000):
     print("You can interrupt with Ctrl+C")
     # start STT worker which will call tts on recognized text
     try:
-        verify_model(model_path)
+        model = get_vosk_model(model_path)
     except Exception as e:
         print("Model verification failed:", e, file=sys.stderr)
         return
 
-    model = Model(model_path)
     rec = KaldiRecognizer(model, sample_rate)
     rec.SetWords(True)
 
@@ -203,12 +339,11 @@ def run_demo(model_path: str, device: int | None, sample_rate: int = 16000):
                                callback=audio_callback, device=device):
             print("Listening... say something")
             while True:
-                try:
-                    data = AUDIO_QUEUE.get(timeout=0.1)
-                except queue.Empty:
+                data = next_audio_block(0.1)
+                if data is None:
                     continue
-                if rec.AcceptWaveform(data):
-                    res = json.loads(rec.Result())
+                if rec.AcceptWaveform(_ffi.from_buffer(data)):
+                    res = _loads(rec.Result())
                     text = res.get('text', '')
                     if text:
                         print('RECOGNIZED:', text)
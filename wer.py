@@ -1,21 +1,162 @@
 """Word Error Rate (WER) utilities.
 
 Provides a simple, well-tested implementation of WER using Levenshtein
-distance at the word level. Exported function:
+distance at the word level. Exported functions:
 
   wer(ref: str, hyp: str) -> float
+  wer_batch(refs: list[str], hyps: list[str]) -> numpy.ndarray
 
 Also includes a small CLI so users can compute WER from the command line.
 """
 from __future__ import annotations
 
 import argparse
-from typing import List, Tuple
+import math
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 
+if TYPE_CHECKING:
+    import numpy
 
-def _edit_distance(ref_words: List[str], hyp_words: List[str]) -> Tuple[int, int, int]:
+# Optional compiled kernels (numba + numpy) live in _wer_jit. Importing and
+# compiling them costs far more than scoring a short pair in pure Python, so
+# they are only loaded on the first input of at least _JIT_MIN_CELLS DP cells.
+_JIT_MIN_CELLS = 40_000
+_jit_module = None
+
+
+def _jit():
+    """Return the _wer_jit module, or None if numba/numpy aren't installed."""
+    global _jit_module
+    if _jit_module is None:
+        try:
+            import _wer_jit
+        except Exception:
+            _wer_jit = False
+        _jit_module = _wer_jit
+    return _jit_module or None
+
+
+# Above this many DP cells the full (n+1) x (m+1) matrix gets expensive to
+# hold, so the alignment is recovered with Hirschberg's method instead. That
+# keeps memory at O(m) but does roughly twice the cell updates, so short
+# inputs stay on the full-matrix path.
+_FULL_MATRIX_MAX_CELLS = 4_000_000
+
+
+def _intern(ref_words: List[str], hyp_words: List[str]) -> Tuple[List[int], List[int]]:
+    """Map each distinct word to a small integer id shared by both sides.
+
+    The DP then compares ints instead of strings in its inner loop.
+    """
+    vocab: dict = {}
+    ref_ids = [vocab.setdefault(w, len(vocab)) for w in ref_words]
+    hyp_ids = [vocab.setdefault(w, len(vocab)) for w in hyp_words]
+    return ref_ids, hyp_ids
+
+
+def _edit_distance(ref_ids: List[int], hyp_ids: List[int]) -> Tuple[int, int, int]:
     """Compute word-level Levenshtein distance and return (S, D, I).
 
+    Takes word ids as produced by `_intern`. Short inputs use
+    `_edit_distance_py`; from _JIT_MIN_CELLS cells up the numba kernel is used
+    when available. Very long inputs go through `_hirschberg` to avoid
+    allocating the full matrix.
+    """
+    ref, hyp = ref_ids, hyp_ids
+    cells = len(ref) * len(hyp)
+    jit = _jit() if cells >= _JIT_MIN_CELLS else None
+    if jit is not None:
+        ref = jit.np.asarray(ref_ids, dtype=jit.np.int32)
+        hyp = jit.np.asarray(hyp_ids, dtype=jit.np.int32)
+
+    if cells > _FULL_MATRIX_MAX_CELLS:
+        ops = _hirschberg(ref, hyp)
+        return ops.count('S'), ops.count('D'), ops.count('I')
+
+    if jit is None:
+        return _edit_distance_py(ref, hyp)
+    S, D, I = jit.ed_kernel(ref, hyp)
+    return int(S), int(D), int(I)
+
+
+def _ed_two_row_py(ref, hyp) -> List[int]:
+    """Return the last row of the edit-distance DP, keeping only two rows."""
+    m = len(hyp)
+    prev = list(range(m + 1))
+    for i in range(1, len(ref) + 1):
+        cur = [i] + [0] * m
+        r = ref[i - 1]
+        for j in range(1, m + 1):
+            if r == hyp[j - 1]:
+                cur[j] = prev[j - 1]
+            else:
+                cur[j] = min(prev[j - 1], prev[j], cur[j - 1]) + 1
+        prev = cur
+    return prev
+
+
+def _ed_two_row(ref, hyp) -> Tuple[int, list]:
+    """Edit distance in O(len(hyp)) memory.
+
+    Returns (distance, last_row) where last_row[j] is the distance between
+    `ref` and `hyp[:j]`.
+    """
+    # id arrays only exist once _edit_distance has loaded the kernels
+    jit = _jit_module or None
+    if jit is not None and isinstance(ref, jit.np.ndarray):
+        row = jit.row_kernel(jit.np.ascontiguousarray(ref), jit.np.ascontiguousarray(hyp))
+    else:
+        row = _ed_two_row_py(ref, hyp)
+    return int(row[-1]), row
+
+
+def _hirschberg(ref, hyp) -> List[str]:
+    """Recover an optimal alignment with Hirschberg's divide and conquer.
+
+    Returns a list of ops, one per aligned position: 'M' (match),
+    'S' (substitution), 'D' (deletion) or 'I' (insertion).
+    """
+    ops: List[str] = []
+    _hirschberg_into(ref, hyp, ops)
+    return ops
+
+
+def _hirschberg_into(ref, hyp, ops: List[str]) -> None:
+    n = len(ref)
+    m = len(hyp)
+    if n == 0:
+        ops.extend('I' * m)
+        return
+    if m == 0:
+        ops.extend('D' * n)
+        return
+    if n == 1 or m == 1:
+        # a single word on one side either matches somewhere on the other
+        # side or is substituted for its first word; the rest are I/D
+        one, other, gap = (ref[0], hyp, 'I') if n == 1 else (hyp[0], ref, 'D')
+        k = next((j for j in range(len(other)) if other[j] == one), -1)
+        if k < 0:
+            ops.append('S')
+            ops.extend(gap * (len(other) - 1))
+        else:
+            ops.extend(gap * k)
+            ops.append('M')
+            ops.extend(gap * (len(other) - k - 1))
+        return
+
+    mid = n // 2
+    _, left = _ed_two_row(ref[:mid], hyp)
+    _, right = _ed_two_row(ref[mid:][::-1], hyp[::-1])
+    split = min(range(m + 1), key=lambda j: left[j] + right[m - j])
+    _hirschberg_into(ref[:mid], hyp[:split], ops)
+    _hirschberg_into(ref[mid:], hyp[split:], ops)
+
+
+def _edit_distance_py(ref_words: List[int], hyp_words: List[int]) -> Tuple[int, int, int]:
+    """Pure-Python word-level Levenshtein distance returning (S, D, I).
+
+    Works on any sequences of comparable items, but is fastest on word ids.
+
     Returns:
       S: substitutions
       D: deletions
@@ -75,8 +216,8 @@ def wer(reference: str, hypothesis: str) -> float:
     treat an empty reference as special.
     """
     # Simple tokenization on whitespace; callers can pre-normalize if needed.
-    ref_words = reference.strip().split() if reference.strip() else []
-    hyp_words = hypothesis.strip().split() if hypothesis.strip() else []
+    ref_words = reference.split()
+    hyp_words = hypothesis.split()
 
     if len(ref_words) == 0:
         if len(hyp_words) == 0:
@@ -84,16 +225,66 @@ def wer(reference: str, hypothesis: str) -> float:
         # define as infinite/error; caller might want to handle this case
         return float('inf')
 
-    S, D, I = _edit_distance(ref_words, hyp_words)
+    S, D, I = _edit_distance(*_intern(ref_words, hyp_words))
     wer_value = (S + D + I) / len(ref_words)
     return wer_value
 
 
+def wer_batch(references: Sequence[str], hypotheses: Sequence[str]) -> numpy.ndarray:
+    """Calculate WER for each (reference, hypothesis) pair of a corpus.
+
+    Returns a float64 array with the same values `wer` gives for each pair.
+    With numba, all pairs are interned into one flat int32 buffer (plus
+    offsets) and scored in parallel across CPU cores; otherwise this loops
+    over `wer`.
+    """
+    if len(references) != len(hypotheses):
+        raise ValueError("references and hypotheses must have the same length")
+    # corpus scoring is the bulk case the kernels exist for, so load them up front
+    jit = _jit()
+    if jit is None:
+        import numpy
+        return numpy.array([wer(r, h) for r, h in zip(references, hypotheses)], dtype=numpy.float64)
+    np = jit.np
+
+    vocab: dict = {}
+    ref_ids: List[int] = []
+    hyp_ids: List[int] = []
+    ref_off = [0]
+    hyp_off = [0]
+    for r, h in zip(references, hypotheses):
+        ref_ids.extend([vocab.setdefault(w, len(vocab)) for w in r.split()])
+        hyp_ids.extend([vocab.setdefault(w, len(vocab)) for w in h.split()])
+        ref_off.append(len(ref_ids))
+        hyp_off.append(len(hyp_ids))
+
+    out = np.empty(len(references), dtype=np.float64)
+    jit.wer_batch_kernel(np.array(ref_ids, dtype=np.int32), np.array(ref_off, dtype=np.int64),
+                      np.array(hyp_ids, dtype=np.int32), np.array(hyp_off, dtype=np.int64), out)
+    return out
+
+
 def cli():
     parser = argparse.ArgumentParser(description='Compute WER between reference and hypothesis')
-    parser.add_argument('reference', help='Reference text (quoted)')
-    parser.add_argument('hypothesis', help='Hypothesis text (quoted)')
+    parser.add_argument('reference', nargs='?', help='Reference text (quoted)')
+    parser.add_argument('hypothesis', nargs='?', help='Hypothesis text (quoted)')
+    parser.add_argument('--pairs', metavar='FILE',
+                        help='Score a corpus: one "reference<TAB>hypothesis" pair per line')
     args = parser.parse_args()
+    if args.pairs:
+        with open(args.pairs, encoding='utf-8') as f:
+            pairs = [line.rstrip('\n').split('\t', 1) for line in f if line.strip()]
+        refs = [p[0] for p in pairs]
+        hyps = [p[1] if len(p) > 1 else '' for p in pairs]
+        scores = wer_batch(refs, hyps)
+        for score in scores:
+            print('inf' if score == float('inf') else f'{score:.3f}')
+        finite = [float(x) for x in scores if math.isfinite(x)]
+        if finite:
+            print(f'Mean WER: {sum(finite) / len(finite):.3f} over {len(finite)} pairs')
+        return
+    if args.reference is None or args.hypothesis is None:
+        parser.error('reference and hypothesis are required unless --pairs is given')
     score = wer(args.reference, args.hypothesis)
     if score == float('inf'):
         print('WER: inf (empty reference)')